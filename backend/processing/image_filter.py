@@ -11,7 +11,7 @@ import base64
 import io
 from collections import deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from core.logger import get_logger
 from core.models import RawRecord, RecordType
@@ -143,6 +143,14 @@ class ImageFilter:
             for algo in result:
                 result[algo]['weight'] /= total_weight
 
+        # Flat (name, hash_func, weight) tuples for the hot hashing loop,
+        # avoiding per-iteration dict lookups in _compute_multi_hash
+        self._hash_callables: List[Tuple[str, Callable, float]] = [
+            (algo, info['hash_func'], info['weight'])
+            for algo, info in result.items()
+            if info['hash_func']
+        ]
+
         return result
 
     def _init_content_analyzer(self):
@@ -365,16 +373,11 @@ class ImageFilter:
 
         try:
             result = {}
-            for algo_name, algo_info in self.hash_algorithms.items():
-                hash_func = algo_info['hash_func']
-                weight = algo_info['weight']
-
-                if hash_func:
-                    hash_value = hash_func(img)
-                    result[algo_name] = {
-                        'hash': hash_value,
-                        'weight': weight,
-                    }
+            for algo_name, hash_func, weight in self._hash_callables:
+                result[algo_name] = {
+                    'hash': hash_func(img),
+                    'weight': weight,
+                }
 
             return result if result else None
         except Exception as e:
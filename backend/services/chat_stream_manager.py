@@ -21,14 +21,19 @@ class ChatStreamManager:
     3. Switching conversations does not interrupt an in-progress stream.
     """
 
+    __slots__ = ("_active_streams", "_running")
+
     def __init__(self):
         # conversation_id -> asyncio.Task
         self._active_streams: Dict[str, asyncio.Task] = {}
+        # Conversations with a running task, maintained alongside
+        # _active_streams so status queries are O(1) instead of scanning
+        # every task and calling done()
+        self._running: set[str] = set()
 
     def is_streaming(self, conversation_id: str) -> bool:
         """Return True when the conversation currently has an active stream."""
-        task = self._active_streams.get(conversation_id)
-        return task is not None and not task.done()
+        return conversation_id in self._running
 
     def register_stream(self, conversation_id: str, task: asyncio.Task) -> None:
         """
@@ -48,6 +53,7 @@ class ChatStreamManager:
                 old_task.cancel()
 
         self._active_streams[conversation_id] = task
+        self._running.add(conversation_id)
         logger.debug(f"Registered streaming task for conversation {conversation_id}")
 
         # Clean up automatically when the task finishes
@@ -55,8 +61,9 @@ class ChatStreamManager:
 
     def _cleanup_stream(self, conversation_id: str, task: asyncio.Task) -> None:
         """Remove a completed streaming task."""
-        if self._active_streams.get(conversation_id) == task:
-            del self._active_streams[conversation_id]
+        if self._active_streams.get(conversation_id) is task:
+            self._active_streams.pop(conversation_id, None)
+            self._running.discard(conversation_id)
             logger.debug(f"Cleared streaming task for conversation {conversation_id}")
 
     def cancel_stream(self, conversation_id: str) -> bool:
@@ -78,15 +85,11 @@ class ChatStreamManager:
 
     def get_active_streams_count(self) -> int:
         """Return the number of currently active streaming tasks."""
-        return sum(1 for task in self._active_streams.values() if not task.done())
+        return len(self._running)
 
     def get_active_conversation_ids(self) -> list[str]:
         """Return a list of conversation IDs that are streaming."""
-        return [
-            conv_id
-            for conv_id, task in self._active_streams.items()
-            if not task.done()
-        ]
+        return list(self._running)
 
 
 # Global singleton
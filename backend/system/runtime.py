@@ -9,6 +9,7 @@ import asyncio
 import atexit
 import signal
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from config.loader import get_config
@@ -22,6 +23,23 @@ logger = get_logger(__name__)
 _cleanup_done = False
 _exit_handlers_registered = False
 
+# Shared single-worker executor for the exit-cleanup path (building a
+# fresh pool per cleanup costs several thread spawns at shutdown)
+_cleanup_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_cleanup_executor() -> ThreadPoolExecutor:
+    """Lazily create the single-worker executor used by _cleanup_on_exit"""
+    global _cleanup_executor
+
+    if _cleanup_executor is None:
+        _cleanup_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="runtime-cleanup"
+        )
+        atexit.register(_cleanup_executor.shutdown, wait=False)
+
+    return _cleanup_executor
+
 
 def _cleanup_on_exit():
     """Cleanup function on process exit (sync version for atexit)"""
@@ -41,27 +59,21 @@ def _cleanup_on_exit():
 
         # Run async stop function in sync context
         try:
-            # Try to get current event loop
-            loop = asyncio.get_event_loop()
+            # Cheap probe: raises RuntimeError when no loop is running
+            asyncio.get_running_loop()
+            loop_running = True
+        except RuntimeError:
+            loop_running = False
 
-            # Event loop is running, use new thread to execute cleanup
+        if loop_running:
+            # Event loop is running, cannot use run_until_complete
+            # Create new thread to run stop function
             logger.debug("Event loop is running, using new thread to execute cleanup")
-            if loop.is_running():
-                # Event loop is running, cannot use run_until_complete
-                # Create new thread to run stop function
-                logger.debug("Event loop is running, using new thread to execute cleanup")
-                import concurrent.futures
-
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(lambda: asyncio.run(coordinator.stop(quiet=True)))
-                    future.result(timeout=5.0)  # Wait at most 5 seconds
-            else:
-                # Event loop not running, use directly
-                logger.debug("Using existing event loop to execute cleanup")
-                loop.run_until_complete(coordinator.stop(quiet=True))
-
-        except RuntimeError:
-            # No event loop, create new one
+            executor = _get_cleanup_executor()
+            future = executor.submit(lambda: asyncio.run(coordinator.stop(quiet=True)))
+            future.result(timeout=5.0)  # Wait at most 5 seconds
+        else:
+            # No running event loop, create new one
             logger.debug("Creating new event loop to execute cleanup")
             asyncio.run(coordinator.stop(quiet=True))
 
@@ -78,7 +90,7 @@ def _signal_handler(signum, frame):
     signal_name = signal.Signals(signum).name
     logger.debug(f"Received signal {signal_name}, preparing to exit...")
 
-    # 执行清理
+    # Execute cleanup
     _cleanup_on_exit()
 
     # Exit program
@@ -28,60 +28,69 @@ def check_database():
     cursor = conn.cursor()
 
     # Check combined_todos with schedule
+    # duration_minutes is computed in SQL (times are stored as zero-padded
+    # HH:MM) so the Python loop only formats results
     cursor.execute("""
         SELECT
             id, title,
             scheduled_date, scheduled_time, scheduled_end_time,
-            recurrence_rule, keywords
+            recurrence_rule, keywords,
+            CASE
+                WHEN scheduled_time IS NOT NULL AND scheduled_end_time IS NOT NULL
+                THEN (CAST(substr(scheduled_end_time, 1, 2) AS INTEGER) * 60
+                      + CAST(substr(scheduled_end_time, 4, 2) AS INTEGER))
+                     - (CAST(substr(scheduled_time, 1, 2) AS INTEGER) * 60
+                        + CAST(substr(scheduled_time, 4, 2) AS INTEGER))
+            END AS duration_minutes
         FROM combined_todos
         WHERE scheduled_date IS NOT NULL
         AND deleted = 0
         ORDER BY scheduled_date
     """)
 
-    rows = cursor.fetchall()
+    # Iterate the cursor directly so SQLite streams rows instead of
+    # materializing every Row object up front via fetchall()
+    count = 0
+    for i, row in enumerate(cursor, 1):
+        if i == 1:
+            print("\n📋 Scheduled todos in combined_todos:\n")
+        count = i
+
+        # Buffer each todo into one write instead of ~7 print calls per
+        # row; stdout flushes dominate over the SQL on large tables
+        keywords = json.loads(row['keywords']) if row['keywords'] else []
+        lines = [
+            f"Todo #{i}",
+            f"  ID: {row['id']}",
+            f"  Title: {row['title']}",
+            f"  📅 Scheduled Date: {row['scheduled_date']}",
+            f"  ⏰ Scheduled Time: {row['scheduled_time']}",
+            f"  ⏱️  Scheduled End Time: {row['scheduled_end_time']}",
+            f"  🔄 Recurrence Rule: {row['recurrence_rule']}",
+            f"  🏷️  Keywords: {', '.join(keywords)}",
+        ]
 
-    if not rows:
+        # Check for anomalies (duration already computed in SQL)
+        duration_minutes = row['duration_minutes']
+        if duration_minutes is not None:
+            if duration_minutes < 0:
+                lines.append(
+                    f"  ⚠️  WARNING: End time ({row['scheduled_end_time']}) "
+                    f"is before start time ({row['scheduled_time']})!"
+                )
+            else:
+                hours = duration_minutes // 60
+                minutes = duration_minutes % 60
+                duration_text = f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
+                lines.append(f"  ✅ Duration: {duration_text}")
+
+        lines.append("")
+        print("\n".join(lines))
+
+    if count == 0:
         print("ℹ️  No scheduled todos found in combined_todos")
     else:
-        print(f"\n📋 Found {len(rows)} scheduled todo(s) in combined_todos:\n")
-
-        for i, row in enumerate(rows, 1):
-            print(f"Todo #{i}")
-            print(f"  ID: {row['id']}")
-            print(f"  Title: {row['title']}")
-            print(f"  📅 Scheduled Date: {row['scheduled_date']}")
-            print(f"  ⏰ Scheduled Time: {row['scheduled_time']}")
-            print(f"  ⏱️  Scheduled End Time: {row['scheduled_end_time']}")
-            print(f"  🔄 Recurrence Rule: {row['recurrence_rule']}")
-
-            # Parse keywords
-            keywords = json.loads(row['keywords']) if row['keywords'] else []
-            print(f"  🏷️  Keywords: {', '.join(keywords)}")
-
-            # Check for anomalies
-            if row['scheduled_time'] and row['scheduled_end_time']:
-                start_time = row['scheduled_time']
-                end_time = row['scheduled_end_time']
-
-                # Parse time (HH:MM)
-                start_parts = start_time.split(':')
-                end_parts = end_time.split(':')
-
-                if len(start_parts) == 2 and len(end_parts) == 2:
-                    start_minutes = int(start_parts[0]) * 60 + int(start_parts[1])
-                    end_minutes = int(end_parts[0]) * 60 + int(end_parts[1])
-
-                    if end_minutes < start_minutes:
-                        print(f"  ⚠️  WARNING: End time ({end_time}) is before start time ({start_time})!")
-                    else:
-                        duration_minutes = end_minutes - start_minutes
-                        hours = duration_minutes // 60
-                        minutes = duration_minutes % 60
-                        duration_text = f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
-                        print(f"  ✅ Duration: {duration_text}")
-
-            print()
+        print(f"📋 Found {count} scheduled todo(s) in combined_todos")
 
     # Check todos table as well
     cursor.execute("""
@@ -95,18 +104,22 @@ def check_database():
         ORDER BY scheduled_date
     """)
 
-    rows = cursor.fetchall()
-
-    if rows:
-        print(f"\n📋 Found {len(rows)} scheduled todo(s) in todos table:\n")
-        for i, row in enumerate(rows, 1):
-            print(f"Todo #{i}")
-            print(f"  ID: {row['id']}")
-            print(f"  Title: {row['title']}")
-            print(f"  📅 Scheduled Date: {row['scheduled_date']}")
-            print(f"  ⏰ Scheduled Time: {row['scheduled_time']}")
-            print(f"  ⏱️  Scheduled End Time: {row['scheduled_end_time']}")
-            print()
+    count = 0
+    for i, row in enumerate(cursor, 1):
+        if i == 1:
+            print("\n📋 Scheduled todos in todos table:\n")
+        count = i
+        print(
+            f"Todo #{i}\n"
+            f"  ID: {row['id']}\n"
+            f"  Title: {row['title']}\n"
+            f"  📅 Scheduled Date: {row['scheduled_date']}\n"
+            f"  ⏰ Scheduled Time: {row['scheduled_time']}\n"
+            f"  ⏱️  Scheduled End Time: {row['scheduled_end_time']}\n"
+        )
+
+    if count:
+        print(f"📋 Found {count} scheduled todo(s) in todos table")
 
     conn.close()
 
@@ -124,22 +137,35 @@ def check_table_structure():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    for table in ["todos", "combined_todos"]:
+    tables = ["todos", "combined_todos"]
+
+    # One sqlite_master/pragma_table_info join covers every table,
+    # replacing a PRAGMA table_info round-trip per table
+    cursor.execute(
+        """
+        SELECT m.name AS table_name, p.name AS col_name, p.type AS col_type
+        FROM sqlite_master m
+        JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table' AND m.name IN (?, ?)
+        """,
+        tables,
+    )
+    columns_by_table: dict[str, list[tuple[str, str]]] = {table: [] for table in tables}
+    for table_name, col_name, col_type in cursor:
+        columns_by_table[table_name].append((col_name, col_type))
+
+    for table in tables:
         print(f"\n📊 Table: {table}")
         print("-" * 40)
 
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = cursor.fetchall()
-
         schedule_columns = [
-            col for col in columns
-            if 'schedule' in col[1].lower() or 'recurrence' in col[1].lower()
+            (name, col_type) for name, col_type in columns_by_table[table]
+            if 'schedule' in name.lower() or 'recurrence' in name.lower()
         ]
 
         if schedule_columns:
             print("Schedule-related columns:")
-            for col in schedule_columns:
-                col_id, name, col_type, not_null, default, pk = col
+            for name, col_type in schedule_columns:
                 print(f"  - {name} ({col_type})")
         else:
             print("  ⚠️  No schedule-related columns found!")
@@ -17,11 +17,26 @@ from pathlib import Path
 # Database path
 DB_PATH = Path.home() / ".config" / "ido" / "ido.db"
 
-def check_column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
-    """Check if a column exists in a table"""
-    cursor = conn.execute(f"PRAGMA table_info({table})")
-    columns = [row[1] for row in cursor.fetchall()]
-    return column in columns
+def _existing_columns(conn: sqlite3.Connection, tables: list[str]) -> dict[str, set[str]]:
+    """Map each table to its column names with a single reflection query
+
+    One sqlite_master/pragma_table_info join replaces a separate
+    PRAGMA table_info round-trip per column check.
+    """
+    placeholders = ", ".join("?" for _ in tables)
+    cursor = conn.execute(
+        f"""
+        SELECT m.name AS table_name, p.name AS col_name
+        FROM sqlite_master m
+        JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table' AND m.name IN ({placeholders})
+        """,
+        tables,
+    )
+    columns: dict[str, set[str]] = {table: set() for table in tables}
+    for table_name, col_name in cursor:
+        columns[table_name].add(col_name)
+    return columns
 
 def migrate():
     """Run migration"""
@@ -32,19 +47,29 @@ def migrate():
     print(f"📊 Starting migration for database: {DB_PATH}")
     print(f"⏰ Migration time: {datetime.now().isoformat()}\n")
 
+    # Default tuple rows are enough here (all access is positional) and
+    # skip the per-row sqlite3.Row wrapper allocation
     conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+
+    # WAL + NORMAL turns each commit into a WAL append instead of a full
+    # journal fsync; one explicit transaction covers all DDL below
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
 
     try:
         tables = ["todos", "combined_todos"]
 
+        conn.execute("BEGIN IMMEDIATE")
+
+        existing = _existing_columns(conn, tables)
+
         for table in tables:
             print(f"\n{'='*60}")
             print(f"Migrating table: {table}")
             print(f"{'='*60}\n")
 
             # Step 1: Add scheduled_end_time column
-            if check_column_exists(conn, table, "scheduled_end_time"):
+            if "scheduled_end_time" in existing[table]:
                 print(f"✅ Column 'scheduled_end_time' already exists in {table} table")
             else:
                 print(f"➕ Adding 'scheduled_end_time' column to {table} table...")
@@ -52,11 +77,10 @@ def migrate():
                     ALTER TABLE {table}
                     ADD COLUMN scheduled_end_time TEXT
                 """)
-                conn.commit()
                 print("✅ Column added successfully")
 
             # Step 2: Add recurrence_rule column
-            if check_column_exists(conn, table, "recurrence_rule"):
+            if "recurrence_rule" in existing[table]:
                 print(f"✅ Column 'recurrence_rule' already exists in {table} table")
             else:
                 print(f"➕ Adding 'recurrence_rule' column to {table} table...")
@@ -64,7 +88,6 @@ def migrate():
                     ALTER TABLE {table}
                     ADD COLUMN recurrence_rule TEXT
                 """)
-                conn.commit()
                 print("✅ Column added successfully")
 
         # Step 3: Create indexes for better performance
@@ -73,18 +96,35 @@ def migrate():
         print(f"{'='*60}\n")
 
         for table in tables:
-            # Index on scheduled_end_time
-            print(f"📇 Creating index on {table}.scheduled_end_time...")
+            # Composite index matching the real scheduling queries, which
+            # filter and sort on scheduled_date (a lone scheduled_end_time
+            # index would never be chosen for those predicates)
+            print(f"📇 Creating scheduling index on {table}...")
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_scheduled
+                ON {table}(scheduled_date, scheduled_time, scheduled_end_time)
+                WHERE deleted = 0
+            """)
+
+            # Partial covering index for the scheduled-todo scans
+            # (WHERE deleted = 0 AND scheduled_date IS NOT NULL
+            # ORDER BY scheduled_date becomes an index-only scan that
+            # already delivers rows in sort order)
+            print(f"📇 Creating active-schedule index on {table}...")
             conn.execute(f"""
-                CREATE INDEX IF NOT EXISTS idx_{table}_scheduled_end_time
-                ON {table}(scheduled_end_time)
+                CREATE INDEX IF NOT EXISTS idx_{table}_active_sched
+                ON {table}(scheduled_date)
+                WHERE deleted = 0 AND scheduled_date IS NOT NULL
             """)
 
-            # Index on recurrence_rule (for quickly finding recurring todos)
+            # Partial index on recurrence_rule (for quickly finding
+            # recurring todos; most rows have NULL here, so indexing only
+            # the non-null minority keeps the index tiny and insert-cheap)
             print(f"📇 Creating index on {table}.recurrence_rule...")
             conn.execute(f"""
                 CREATE INDEX IF NOT EXISTS idx_{table}_recurrence_rule
                 ON {table}(recurrence_rule)
+                WHERE recurrence_rule IS NOT NULL AND deleted = 0
             """)
 
         conn.commit()
@@ -101,14 +141,14 @@ def migrate():
                 FROM {table}
                 WHERE deleted = 0
             """)
-            total = cursor.fetchone()["total"]
+            total = cursor.fetchone()[0]
 
             cursor = conn.execute(f"""
                 SELECT COUNT(*) as with_schedule
                 FROM {table}
                 WHERE deleted = 0 AND scheduled_date IS NOT NULL
             """)
-            with_schedule = cursor.fetchone()["with_schedule"]
+            with_schedule = cursor.fetchone()[0]
 
             print(f"{table}:")
             print(f"  Total records: {total}")
@@ -125,6 +165,11 @@ def migrate():
         conn.rollback()
         return False
     finally:
+        try:
+            # Let the planner decide whether the new indexes warrant ANALYZE
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
         conn.close()
 
 if __name__ == "__main__":
@@ -11,14 +11,113 @@ Arguments:
 """
 
 import argparse
-import asyncio
-import shutil
 import sqlite3
 import sys
 from datetime import datetime
 from pathlib import Path
 
 
+# Bulk-copy statements, hoisted so the shared connection can reuse its
+# cached prepared plan and the methods stay declarative
+_SQL_INSERT_ACTIONS = """
+    INSERT INTO actions (id, title, description, keywords, timestamp, deleted, created_at)
+    SELECT id, title, description, keywords, timestamp, deleted, created_at
+    FROM events
+"""
+
+_SQL_INSERT_ACTION_IMAGES = """
+    INSERT INTO action_images (action_id, hash, created_at)
+    SELECT event_id, hash, created_at
+    FROM event_images
+"""
+
+# version_expr depends on whether the source schema has a version column
+_SQL_INSERT_EVENTS_V2 = """
+    INSERT INTO events_v2 (
+        id, title, description, start_time, end_time,
+        source_action_ids, version, deleted, created_at
+    )
+    SELECT id, title, description, start_time, end_time,
+           source_event_ids, {version_expr}, deleted, created_at
+    FROM activities
+    WHERE deleted = 0
+"""
+
+# Transitional v2 DDL. schema.py no longer defines these tables — they
+# were renamed to the v1 names by migrate_v2_to_v1.py, so only this
+# migration needs the *_v2 shapes (kept identical to the current
+# events/activities definitions so the later rename lands on the
+# schema the application expects).
+CREATE_EVENTS_V2_TABLE = """
+    CREATE TABLE IF NOT EXISTS events_v2 (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        source_action_ids TEXT,
+        aggregated_into_activity_id TEXT,
+        version INTEGER DEFAULT 1,
+        deleted BOOLEAN DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (aggregated_into_activity_id) REFERENCES activities_v2(id) ON DELETE SET NULL
+    )
+"""
+
+CREATE_ACTIVITIES_V2_TABLE = """
+    CREATE TABLE IF NOT EXISTS activities_v2 (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        session_duration_minutes INTEGER,
+        topic_tags TEXT,
+        source_event_ids TEXT,
+        source_action_ids TEXT,
+        aggregation_mode TEXT DEFAULT 'action_based' CHECK(aggregation_mode IN ('event_based', 'action_based')),
+        user_merged_from_ids TEXT,
+        user_split_into_ids TEXT,
+        pomodoro_session_id TEXT,
+        pomodoro_work_phase INTEGER,
+        focus_score REAL,
+        deleted BOOLEAN DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+CREATE_EVENTS_V2_START_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_events_v2_start_time
+    ON events_v2(start_time DESC)
+"""
+
+CREATE_EVENTS_V2_CREATED_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_events_v2_created
+    ON events_v2(created_at DESC)
+"""
+
+CREATE_EVENTS_V2_AGGREGATED_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_events_v2_aggregated
+    ON events_v2(aggregated_into_activity_id)
+"""
+
+CREATE_ACTIVITIES_V2_START_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_activities_v2_start_time
+    ON activities_v2(start_time DESC)
+"""
+
+CREATE_ACTIVITIES_V2_CREATED_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_activities_v2_created
+    ON activities_v2(created_at DESC)
+"""
+
+CREATE_ACTIVITIES_V2_UPDATED_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_activities_v2_updated
+    ON activities_v2(updated_at DESC)
+"""
+
+
 class ThreeLayerMigration:
     """Migration manager for three-layer architecture"""
 
@@ -27,6 +126,9 @@ class ThreeLayerMigration:
         self.dry_run = dry_run
         self.backup_path = db_path.parent / f"ido_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
 
+        # Shared connection: the whole migration runs as one transaction
+        self.conn = None
+
         # Statistics
         self.stats = {
             "events_migrated": 0,
@@ -35,12 +137,38 @@ class ThreeLayerMigration:
         }
 
     def _connect(self) -> sqlite3.Connection:
-        """Create database connection"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    async def execute(self):
+        """Create database connection
+
+        Default tuple rows: every access in this script is positional,
+        so the sqlite3.Row wrapper would only add per-row allocation.
+        """
+        return sqlite3.connect(str(self.db_path))
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """
+        Get the shared migration connection, opening it on first use
+
+        All migration phases run on one connection inside a single
+        BEGIN IMMEDIATE transaction, so the whole migration pays one
+        commit. synchronous=OFF is safe here because phase 1 has already
+        written a verified backup.
+        """
+        if self.conn is None:
+            self.conn = self._connect()
+            # WAL persists in the database file after migration, which is
+            # the journal mode the application wants anyway. The cache and
+            # mmap sizes only last for this connection.
+            self.conn.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=OFF;"
+                "PRAGMA temp_store=MEMORY;"
+                "PRAGMA cache_size=-131072;"
+                "PRAGMA mmap_size=268435456;"
+            )
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def execute(self):
         """Execute migration in phases"""
         print("=" * 60)
         print("Three-Layer Architecture Migration")
@@ -55,18 +183,40 @@ class ThreeLayerMigration:
 
         try:
             # Phase 1: Backup
-            await self._backup_database()
+            self._backup_database()
 
             # Phase 2: Create new tables
-            await self._create_new_tables()
+            self._create_new_tables()
 
             # Phase 3: Migrate data
-            await self._migrate_events_to_actions()
-            await self._migrate_event_images_to_action_images()
-            await self._migrate_activities_to_events()
+            self._migrate_events_to_actions()
+            self._migrate_event_images_to_action_images()
+            self._migrate_activities_to_events()
+
+            # Refresh planner statistics for the freshly bulk-loaded
+            # tables; without this the first application queries plan
+            # against empty-table stats. Plain execute keeps the ANALYZE
+            # inside the migration transaction (executescript would
+            # commit it early).
+            if not self.dry_run:
+                conn = self._get_conn()
+                for table in ("actions", "events_v2", "action_images", "activities_v2"):
+                    conn.execute(f"ANALYZE {table}")
 
             # Phase 4: Verify integrity
-            await self._verify_migration()
+            self._verify_migration()
+
+            # Single commit for all phases, then restore durability and
+            # refresh planner statistics
+            if self.conn is not None:
+                if self.dry_run:
+                    self.conn.rollback()
+                else:
+                    self.conn.commit()
+                    self.conn.execute("PRAGMA synchronous=NORMAL")
+                    self.conn.execute("PRAGMA optimize")
+                self.conn.close()
+                self.conn = None
 
             # Summary
             print()
@@ -94,34 +244,70 @@ class ThreeLayerMigration:
             import traceback
             traceback.print_exc()
 
+            # Roll back the single migration transaction
+            if self.conn is not None:
+                try:
+                    self.conn.rollback()
+                finally:
+                    self.conn.close()
+                    self.conn = None
+
             if not self.dry_run and self.backup_path.exists():
                 print(f"\n⚠️  Backup available at: {self.backup_path}")
                 print("  You can restore it manually if needed")
 
             sys.exit(1)
 
-    async def _backup_database(self):
+    def _backup_database(self):
         """Create full database backup"""
         print("[1/5] Backing up database...")
 
         if self.dry_run:
             print(f"  [DRY RUN] Would backup to: {self.backup_path}")
-        else:
-            shutil.copy2(self.db_path, self.backup_path)
-            # Verify backup
-            if not self.backup_path.exists():
-                raise RuntimeError("Backup file not created")
-            backup_size = self.backup_path.stat().st_size
-            original_size = self.db_path.stat().st_size
-            if backup_size != original_size:
-                raise RuntimeError(f"Backup size mismatch: {backup_size} != {original_size}")
-            print(f"  ✓ Backup created: {self.backup_path} ({backup_size:,} bytes)")
-
-    async def _create_new_tables(self):
+            return
+
+        # VACUUM INTO writes a compact, consistent snapshot (free pages
+        # and WAL content are not carried over), staying safe against
+        # concurrent writers unlike a raw file copy
+        src = sqlite3.connect(str(self.db_path))
+        try:
+            escaped = str(self.backup_path).replace("'", "''")
+            try:
+                src.execute(f"VACUUM INTO '{escaped}'")
+            except sqlite3.OperationalError:
+                # VACUUM INTO needs SQLite >= 3.27; fall back to the
+                # page-level online backup API
+                dst = sqlite3.connect(str(self.backup_path))
+                try:
+                    src.backup(dst, pages=1024)
+                finally:
+                    dst.close()
+        finally:
+            src.close()
+
+        # Verify backup (sizes may legitimately differ with WAL, so check
+        # integrity instead of comparing byte counts)
+        if not self.backup_path.exists():
+            raise RuntimeError("Backup file not created")
+
+        check_conn = sqlite3.connect(str(self.backup_path))
+        try:
+            result = check_conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            check_conn.close()
+
+        if result != "ok":
+            raise RuntimeError(f"Backup integrity check failed: {result}")
+
+        backup_size = self.backup_path.stat().st_size
+        print(f"  ✓ Backup created: {self.backup_path} ({backup_size:,} bytes)")
+
+    def _create_new_tables(self):
         """Create new schema tables"""
         print("\n[2/5] Creating new tables...")
 
-        # Import schema definitions
+        # Import schema definitions (the *_V2_* DDL lives in this script;
+        # schema.py dropped it when the v2 tables were renamed to v1 names)
         sys.path.insert(0, str(Path(__file__).parent.parent))
         from backend.core.sqls.schema import (
             CREATE_ACTION_IMAGES_ACTION_ID_INDEX,
@@ -131,21 +317,12 @@ class ThreeLayerMigration:
             CREATE_ACTIONS_CREATED_INDEX,
             CREATE_ACTIONS_TABLE,
             CREATE_ACTIONS_TIMESTAMP_INDEX,
-            CREATE_ACTIVITIES_V2_CREATED_INDEX,
-            CREATE_ACTIVITIES_V2_START_TIME_INDEX,
-            CREATE_ACTIVITIES_V2_TABLE,
-            CREATE_ACTIVITIES_V2_UPDATED_INDEX,
-            CREATE_EVENTS_V2_AGGREGATED_INDEX,
-            CREATE_EVENTS_V2_CREATED_INDEX,
-            CREATE_EVENTS_V2_START_TIME_INDEX,
-            CREATE_EVENTS_V2_TABLE,
             CREATE_SESSION_PREFERENCES_CONFIDENCE_INDEX,
             CREATE_SESSION_PREFERENCES_TABLE,
             CREATE_SESSION_PREFERENCES_TYPE_INDEX,
         )
 
-        conn = self._connect()
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
 
         try:
             # Create tables
@@ -157,13 +334,6 @@ class ThreeLayerMigration:
                 ("session_preferences", CREATE_SESSION_PREFERENCES_TABLE),
             ]
 
-            for table_name, create_sql in tables:
-                if self.dry_run:
-                    print(f"  [DRY RUN] Would create table: {table_name}")
-                else:
-                    cursor.execute(create_sql)
-                    print(f"  ✓ Created table: {table_name}")
-
             # Create indexes
             indexes = [
                 CREATE_ACTIONS_TIMESTAMP_INDEX,
@@ -181,27 +351,35 @@ class ThreeLayerMigration:
                 CREATE_SESSION_PREFERENCES_CONFIDENCE_INDEX,
             ]
 
-            for idx_sql in indexes:
-                if not self.dry_run:
-                    cursor.execute(idx_sql)
-
-            if not self.dry_run:
-                print(f"  ✓ Created {len(indexes)} indexes")
-            else:
+            if self.dry_run:
+                for table_name, _ in tables:
+                    print(f"  [DRY RUN] Would create table: {table_name}")
                 print(f"  [DRY RUN] Would create {len(indexes)} indexes")
-
-            if not self.dry_run:
-                conn.commit()
+            else:
+                # One executescript parses the whole DDL batch instead of
+                # 19 separate execute round trips. executescript commits
+                # any open transaction first — at this point the migration
+                # transaction holds no changes yet, so reopen it afterwards
+                # to keep the data phases atomic.
+                ddl = ";\n".join(
+                    sql.strip().rstrip(";")
+                    for sql in [create_sql for _, create_sql in tables] + indexes
+                ) + ";"
+                cursor.executescript(ddl)
+                self._get_conn().execute("BEGIN IMMEDIATE")
+
+                for table_name, _ in tables:
+                    print(f"  ✓ Created table: {table_name}")
+                print(f"  ✓ Created {len(indexes)} indexes")
 
         finally:
-            conn.close()
+            cursor.close()
 
-    async def _migrate_events_to_actions(self):
+    def _migrate_events_to_actions(self):
         """Migrate: events → actions"""
         print("\n[3/5] Migrating events → actions...")
 
-        conn = self._connect()
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
 
         try:
             # Check if old events table exists and has data
@@ -216,27 +394,21 @@ class ThreeLayerMigration:
                 print(f"  [DRY RUN] Would migrate {count} events → actions")
             else:
                 # Copy all events to actions table
-                cursor.execute("""
-                    INSERT INTO actions (id, title, description, keywords, timestamp, deleted, created_at)
-                    SELECT id, title, description, keywords, timestamp, deleted, created_at
-                    FROM events
-                """)
+                cursor.execute(_SQL_INSERT_ACTIONS)
 
                 migrated_count = cursor.rowcount
                 self.stats["events_migrated"] = migrated_count
-                conn.commit()
 
                 print(f"  ✓ Migrated {migrated_count} events → actions")
 
         finally:
-            conn.close()
+            cursor.close()
 
-    async def _migrate_event_images_to_action_images(self):
+    def _migrate_event_images_to_action_images(self):
         """Migrate: event_images → action_images"""
         print("\n[4/5] Migrating event_images → action_images...")
 
-        conn = self._connect()
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
 
         try:
             # Check if old event_images table exists
@@ -255,103 +427,89 @@ class ThreeLayerMigration:
             if self.dry_run:
                 print(f"  [DRY RUN] Would migrate {count} event_images → action_images")
             else:
-                cursor.execute("""
-                    INSERT INTO action_images (action_id, hash, created_at)
-                    SELECT event_id, hash, created_at
-                    FROM event_images
-                """)
+                cursor.execute(_SQL_INSERT_ACTION_IMAGES)
 
                 migrated_count = cursor.rowcount
                 self.stats["event_images_migrated"] = migrated_count
-                conn.commit()
 
                 print(f"  ✓ Migrated {migrated_count} event_images → action_images")
 
         finally:
-            conn.close()
+            cursor.close()
 
-    async def _migrate_activities_to_events(self):
+    def _migrate_activities_to_events(self):
         """Migrate: activities → events_v2"""
         print("\n[5/5] Migrating activities → events_v2...")
 
-        conn = self._connect()
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
 
         try:
-            # Get all activities
-            cursor.execute("SELECT * FROM activities WHERE deleted = 0")
-            activities = cursor.fetchall()
+            cursor.execute("SELECT COUNT(*) FROM activities WHERE deleted = 0")
+            count = cursor.fetchone()[0]
 
-            if len(activities) == 0:
+            if count == 0:
                 print("  ℹ No activities to migrate (table empty)")
                 return
 
             if self.dry_run:
-                print(f"  [DRY RUN] Would migrate {len(activities)} activities → events_v2")
+                print(f"  [DRY RUN] Would migrate {count} activities → events_v2")
             else:
-                # Migrate each activity to events_v2
-                # Note: source_event_ids becomes source_action_ids (semantically correct after migration)
-                for activity in activities:
-                    source_action_ids = activity['source_event_ids']  # This now refers to old events = new actions
-                    version = activity['version'] if 'version' in activity.keys() else 1
-
-                    cursor.execute("""
-                        INSERT INTO events_v2 (
-                            id, title, description, start_time, end_time,
-                            source_action_ids, version, deleted, created_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        activity['id'],
-                        activity['title'],
-                        activity['description'],
-                        activity['start_time'],
-                        activity['end_time'],
-                        source_action_ids,  # Now correctly references actions
-                        version,
-                        activity['deleted'],
-                        activity['created_at']
-                    ))
-
-                migrated_count = len(activities)
+                # The version column may be missing on older schemas
+                cursor.execute("PRAGMA table_info(activities)")
+                has_version = any(row[1] == "version" for row in cursor.fetchall())
+                version_expr = "COALESCE(version, 1)" if has_version else "1"
+
+                # Copy in a single INSERT ... SELECT (same pattern as the
+                # events → actions step) instead of one INSERT per row.
+                # Note: source_event_ids becomes source_action_ids
+                # (semantically correct after migration)
+                cursor.execute(_SQL_INSERT_EVENTS_V2.format(version_expr=version_expr))
+
+                migrated_count = cursor.rowcount
                 self.stats["activities_migrated"] = migrated_count
-                conn.commit()
 
                 print(f"  ✓ Migrated {migrated_count} activities → events_v2")
 
         finally:
-            conn.close()
+            cursor.close()
 
-    async def _verify_migration(self):
+    def _verify_migration(self):
         """Verify data integrity post-migration"""
         print("\n[Verification] Checking data integrity...")
 
-        conn = self._connect()
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
 
         try:
-            # Count checks
-            cursor.execute("SELECT COUNT(*) FROM events")
-            old_events_count = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM activities WHERE deleted = 0")
-            old_activities_count = cursor.fetchone()[0]
-
             if self.dry_run:
-                # In dry-run mode, tables don't exist yet, so verify using stats
+                # In dry-run mode, the new tables don't exist yet, so only
+                # count the source tables
+                cursor.execute("""
+                    SELECT (SELECT COUNT(*) FROM events),
+                           (SELECT COUNT(*) FROM activities WHERE deleted = 0)
+                """)
+                old_events_count, old_activities_count = cursor.fetchone()
+
                 print(f"  ✓ Would migrate {old_events_count} events → actions")
                 print(f"  ✓ Would migrate {old_activities_count} activities → events_v2")
                 print("  ✓ Activities (new): 0 records (will be generated by SessionAgent)")
                 print("\n  ✓ Dry-run verification passed!")
             else:
-                # In real mode, verify actual migration results
-                cursor.execute("SELECT COUNT(*) FROM actions")
-                new_actions_count = cursor.fetchone()[0]
-
-                cursor.execute("SELECT COUNT(*) FROM events_v2")
-                new_events_count = cursor.fetchone()[0]
-
-                cursor.execute("SELECT COUNT(*) FROM activities_v2")
-                new_activities_count = cursor.fetchone()[0]
+                # One statement with scalar subqueries counts all five
+                # tables in a single snapshot instead of five round-trips
+                cursor.execute("""
+                    SELECT (SELECT COUNT(*) FROM events),
+                           (SELECT COUNT(*) FROM activities WHERE deleted = 0),
+                           (SELECT COUNT(*) FROM actions),
+                           (SELECT COUNT(*) FROM events_v2),
+                           (SELECT COUNT(*) FROM activities_v2)
+                """)
+                (
+                    old_events_count,
+                    old_activities_count,
+                    new_actions_count,
+                    new_events_count,
+                    new_activities_count,
+                ) = cursor.fetchone()
 
                 # Verify counts
                 errors = []
@@ -374,7 +532,7 @@ class ThreeLayerMigration:
                 print("\n  ✓ All verification checks passed!")
 
         finally:
-            conn.close()
+            cursor.close()
 
 
 def main():
@@ -405,7 +563,7 @@ def main():
         print()
 
     migration = ThreeLayerMigration(args.db_path, dry_run=args.dry_run)
-    asyncio.run(migration.execute())
+    migration.execute()
 
 
 if __name__ == "__main__":
@@ -8,41 +8,111 @@ This script:
 3. Recreates indexes with v1 names
 """
 
+import re
 import sqlite3
 import sys
 from pathlib import Path
 
+# Legacy index names removed by the migration. They end up interpolated
+# into the DDL script (identifiers can't be bound as parameters), so
+# keep them as module-level whitelists validated below.
+V1_LEGACY_INDEXES = (
+    "idx_events_timestamp",
+    "idx_events_created",
+)
 
-def migrate_database(db_path: str) -> None:
+V2_LEGACY_INDEXES = (
+    "idx_events_v2_start_time",
+    "idx_events_v2_created",
+    "idx_events_v2_aggregated",
+    "idx_activities_v2_start_time",
+    "idx_activities_v2_created",
+    "idx_activities_v2_updated",
+)
+
+for _name in V1_LEGACY_INDEXES + V2_LEGACY_INDEXES:
+    assert re.fullmatch(r"idx_[a-z_0-9]+", _name), f"unsafe index name: {_name}"
+
+# DDL statements precomputed once at import so the per-run script
+# assembly only concatenates interned constants
+DROP_TABLE_SQL = {
+    table: f"DROP TABLE IF EXISTS {table}" for table in ("events", "activities")
+}
+
+DROP_INDEX_SQL = {
+    name: f"DROP INDEX IF EXISTS {name}"
+    for name in V1_LEGACY_INDEXES + V2_LEGACY_INDEXES
+}
+
+CREATE_V1_INDEX_SQL = {
+    # (start_time DESC, id) also covers id-by-time-window scans such as
+    # the aggregation pipeline's candidate lookups without touching the
+    # main table
+    "idx_events_start_time": (
+        "CREATE INDEX IF NOT EXISTS idx_events_start_time ON events(start_time DESC, id)"
+    ),
+    "idx_events_created": (
+        "CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at DESC)"
+    ),
+    # Most events are never aggregated; indexing only the minority with
+    # a non-null FK keeps the B-tree small
+    "idx_events_aggregated": (
+        "CREATE INDEX IF NOT EXISTS idx_events_aggregated ON events(aggregated_into_activity_id)"
+        " WHERE aggregated_into_activity_id IS NOT NULL"
+    ),
+    "idx_activities_start_time": (
+        "CREATE INDEX IF NOT EXISTS idx_activities_start_time ON activities(start_time DESC, id)"
+    ),
+    "idx_activities_created": (
+        "CREATE INDEX IF NOT EXISTS idx_activities_created ON activities(created_at DESC)"
+    ),
+    "idx_activities_updated": (
+        "CREATE INDEX IF NOT EXISTS idx_activities_updated ON activities(updated_at DESC)"
+    ),
+}
+
+
+def migrate_database(db_path: str, vacuum: bool = False) -> None:
     """
     Migrate database from v2 to v1 table names
 
     Args:
         db_path: Path to SQLite database file
+        vacuum: Rewrite the database after migration to reclaim the
+            pages freed by the dropped v1 tables and v2 indexes
+            (rewrites the whole file, so opt-in)
     """
     print(f"Starting migration for database: {db_path}")
 
-    conn = sqlite3.connect(db_path)
+    # Autocommit mode: transaction boundaries are issued explicitly so
+    # the whole DDL sequence shares one BEGIN IMMEDIATE ... COMMIT
+    conn = sqlite3.connect(db_path, isolation_level=None)
     cursor = conn.cursor()
 
     try:
-        # Backup first
-        print("\n[1/6] Creating backup...")
-        backup_path = f"{db_path}.backup"
-        backup_conn = sqlite3.connect(backup_path)
-        conn.backup(backup_conn)
-        backup_conn.close()
-        print(f"✅ Backup created at: {backup_path}")
-
-        # Check if v2 tables exist
-        print("\n[2/6] Checking v2 tables...")
+        # Check for v2 tables first: if there is nothing to migrate,
+        # return before paying for a whole-database backup (the common
+        # re-run case)
+        print("\n[1/6] Checking v2 tables...")
+        # One schema-catalog scan answers everything the DDL batch needs:
+        # which v2 tables exist, which legacy v1 tables need dropping,
+        # and which indexes are present
         cursor.execute(
             """
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name IN ('events_v2', 'activities_v2')
+            SELECT name, type, tbl_name FROM sqlite_master
+            WHERE (type='table'
+                   AND name IN ('events', 'activities', 'events_v2', 'activities_v2'))
+               OR type='index'
             """
         )
-        v2_tables = [row[0] for row in cursor.fetchall()]
+        present_tables = set()
+        present_indexes = {}
+        for name, kind, tbl_name in cursor:
+            if kind == "table":
+                present_tables.add(name)
+            else:
+                present_indexes[name] = tbl_name
+        v2_tables = sorted(present_tables & {"events_v2", "activities_v2"})
 
         if not v2_tables:
             print("❌ No v2 tables found. Migration not needed.")
@@ -50,91 +120,125 @@ def migrate_database(db_path: str) -> None:
 
         print(f"✅ Found v2 tables: {', '.join(v2_tables)}")
 
-        # Drop old v1 tables if they exist
-        print("\n[3/6] Dropping old v1 tables...")
-        cursor.execute("DROP TABLE IF EXISTS events")
-        cursor.execute("DROP TABLE IF EXISTS activities")
-        conn.commit()
-        print("✅ Old v1 tables dropped")
-
-        # Drop old v1 indexes
-        print("\n[4/6] Dropping old v1 indexes...")
-        old_indexes = [
-            "idx_events_timestamp",
-            "idx_events_created",
-        ]
-        for idx in old_indexes:
-            cursor.execute(f"DROP INDEX IF EXISTS {idx}")
-        conn.commit()
-        print("✅ Old v1 indexes dropped")
-
-        # Rename v2 tables to v1 names
-        print("\n[5/6] Renaming v2 tables to v1 names...")
-        if "events_v2" in v2_tables:
-            cursor.execute("ALTER TABLE events_v2 RENAME TO events")
-            print("✅ events_v2 -> events")
-
-        if "activities_v2" in v2_tables:
-            cursor.execute("ALTER TABLE activities_v2 RENAME TO activities")
-            print("✅ activities_v2 -> activities")
-
-        conn.commit()
-
-        # Drop old v2 indexes and create new v1 indexes
-        print("\n[6/6] Updating indexes...")
-
-        # Drop old v2 indexes
-        old_v2_indexes = [
-            "idx_events_v2_start_time",
-            "idx_events_v2_created",
-            "idx_events_v2_aggregated",
-            "idx_activities_v2_start_time",
-            "idx_activities_v2_created",
-            "idx_activities_v2_updated",
-        ]
-        for idx in old_v2_indexes:
-            cursor.execute(f"DROP INDEX IF EXISTS {idx}")
-
-        # Create new indexes with v1 names
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_events_start_time
-            ON events(start_time DESC)
-            """
-        )
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_events_created
-            ON events(created_at DESC)
-            """
-        )
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_events_aggregated
-            ON events(aggregated_into_activity_id)
-            """
-        )
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_activities_start_time
-            ON activities(start_time DESC)
-            """
-        )
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_activities_created
-            ON activities(created_at DESC)
-            """
+        # Backup (before the WAL switch — VACUUM INTO needs no write
+        # transaction on the source)
+        print("\n[2/6] Creating backup...")
+        backup_path = f"{db_path}.backup"
+        Path(backup_path).unlink(missing_ok=True)
+        try:
+            # Single sequential pass that skips free pages, so the copy
+            # is faster and smaller than a page-by-page backup
+            cursor.execute("VACUUM INTO ?", (backup_path,))
+        except sqlite3.OperationalError:
+            # VACUUM INTO needs SQLite >= 3.27. Copy in 1024-page
+            # batches so the GIL is released between batches and
+            # progress is visible on large databases.
+            backup_conn = sqlite3.connect(backup_path, isolation_level=None)
+            try:
+                conn.backup(
+                    backup_conn,
+                    pages=1024,
+                    progress=lambda status, remaining, total: print(
+                        f"\r  backup: {total - remaining}/{total} pages", end=""
+                    ),
+                )
+            finally:
+                backup_conn.close()
+            print()
+        print(f"✅ Backup created at: {backup_path}")
+
+        # WAL + NORMAL makes each DDL commit a WAL append instead of a
+        # full rollback-journal fsync; the in-memory temp store and 64MB
+        # cache let the index builds in step [6/6] sort in RAM
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        # Serve page reads via mmap instead of pread, skipping the
+        # user/kernel copy for the table scans feeding the index builds
+        # (silently a no-op on builds without mmap support)
+        cursor.execute("PRAGMA mmap_size=268435456")
+        # Structural DDL should not pay per-row FK checks while tables
+        # disappear and reappear; consistency is validated explicitly
+        # after the batch
+        cursor.execute("PRAGMA foreign_keys=OFF")
+
+        # Assemble the whole DDL sequence into one script so SQLite
+        # prepares it in a single pass instead of a VDBE compile per
+        # statement. BEGIN/COMMIT live inside the script: executescript
+        # would implicitly end any transaction opened beforehand, so the
+        # single durability barrier has to be part of the batch itself.
+        statements = ["BEGIN IMMEDIATE"]
+
+        # [3/6] Drop old v1 tables, skipping absent ones so even the
+        # IF EXISTS no-op write path never runs
+        statements.extend(
+            sql for table, sql in DROP_TABLE_SQL.items() if table in present_tables
         )
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_activities_updated
-            ON activities(updated_at DESC)
-            """
+
+        # [4/6] Drop old v1 indexes, [5/6] drop v2 indexes + rename.
+        # SQLite cannot rename indexes (no ALTER INDEX), and the v2
+        # definitions don't match the tuned v1 ones anyway, so a
+        # drop+recreate round is unavoidable — but only for indexes that
+        # actually exist. The v2 indexes go before the rename so no stale
+        # index metadata or sqlite_stat1 rows are carried across it.
+        statements.extend(
+            sql for idx, sql in DROP_INDEX_SQL.items() if idx in present_indexes
         )
 
-        conn.commit()
-        print("✅ Indexes updated")
+        if "events_v2" in present_tables:
+            statements.append("ALTER TABLE events_v2 RENAME TO events")
+        if "activities_v2" in present_tables:
+            statements.append("ALTER TABLE activities_v2 RENAME TO activities")
+
+        # [6/6] Create v1 indexes on the renamed (already populated)
+        # tables — building indexes after the data is in place is much
+        # faster than carrying them through the move. The creates are
+        # always emitted: a v1-named index in the pre-batch snapshot
+        # lives either on a table this batch drops (it dies with it, so
+        # skipping the create would leave the renamed table unindexed)
+        # or on a v2 table, where it survives the rename and is dropped
+        # first so the tuned definition wins over IF NOT EXISTS.
+        for name, create_sql in CREATE_V1_INDEX_SQL.items():
+            if present_indexes.get(name) in v2_tables:
+                statements.append(f"DROP INDEX IF EXISTS {name}")
+            statements.append(create_sql)
+
+        statements.append("COMMIT")
+
+        print("\n[3-6/6] Applying schema changes...")
+        cursor.executescript(";\n".join(statements) + ";")
+
+        for table in v2_tables:
+            print(f"✅ {table} -> {table.removesuffix('_v2')}")
+        print("✅ Old v1 tables and indexes dropped, v1 indexes rebuilt")
+
+        # Validate FK consistency explicitly now that enforcement was
+        # off during the DDL, then re-enable it
+        violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            print(f"⚠️ foreign_key_check reported {len(violations)} violation(s)")
+        cursor.execute("PRAGMA foreign_keys=ON")
+
+        if vacuum:
+            # Reclaim the pages freed by the dropped tables/indexes.
+            # VACUUM must run outside a transaction, hence the commit
+            # and autocommit switch.
+            print("\n[VACUUM] Reclaiming free pages...")
+            pages_before = cursor.execute("PRAGMA page_count").fetchone()[0]
+            cursor.execute("VACUUM")
+            pages_after = cursor.execute("PRAGMA page_count").fetchone()[0]
+            print(f"✅ VACUUM done: {pages_before} -> {pages_after} pages")
+
+        # Rebuild planner statistics: sqlite_stat1 still describes the
+        # dropped v2 indexes, which would mislead the planner on the
+        # first start_time DESC queries after migration. A failed
+        # ANALYZE is not worth aborting an otherwise complete migration.
+        try:
+            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            print(f"⚠️ ANALYZE failed (migration still complete): {e}")
 
         # Verify migration
         print("\n[Verification] Checking tables...")
@@ -163,13 +267,27 @@ def migrate_database(db_path: str) -> None:
         conn.rollback()
         raise
     finally:
+        # Collapse whatever WAL the migration built up and restore the
+        # default auto-checkpoint threshold so the next app startup
+        # reads a clean file. No-op (or harmless failure) outside WAL
+        # mode or on the early-return path.
+        try:
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            cursor.execute("PRAGMA wal_autocheckpoint=1000")
+        except sqlite3.Error:
+            pass
         conn.close()
 
 
 def main():
     """Main entry point"""
-    if len(sys.argv) > 1:
-        db_path = sys.argv[1]
+    args = sys.argv[1:]
+    vacuum = "--vacuum" in args
+    if vacuum:
+        args.remove("--vacuum")
+
+    if args:
+        db_path = args[0]
     else:
         # Default path
         db_path = str(Path.home() / ".config" / "ido" / "ido.db")
@@ -183,7 +301,7 @@ def main():
     print("=" * 60)
 
     try:
-        migrate_database(db_path)
+        migrate_database(db_path, vacuum=vacuum)
         print("\n" + "=" * 60)
         print("Migration completed!")
         print("=" * 60)